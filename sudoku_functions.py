@@ -3,205 +3,318 @@
 This module provides functions to solve Sudoku puzzles using a backtracking algorithm.
 
 Functions:
-- print_matrix(matrix):
+- print_matrix(board):
   Prints the Sudoku matrix.
 
-- find_box(square):
-  Finds the box (3x3 subgrid) that contains a given square.
+- mask_to_digit(mask):
+  Converts a single-bit mask of a solution to the digit it represents.
 
-- find_empty_squares(matrix):
-  Finds the empty squares in the Sudoku matrix.
+- find_possible_solutions(board):
+  Finds the empty squares in the Sudoku matrix and the possible solutions for each one of them.
 
-- find_possible_solutions(matrix, empty_squares):
-  Finds the possible solutions for each empty square in the Sudoku matrix.
+- place(possible_solutions, square, solution, trail):
+  Removes a solution placed in a square from the possible solutions of its peers.
 
-- compare_solutions(possible_solutions, square):
-  Compares the possible solutions for a square with the solutions of other squares and returns a unique solution if one
-  exists.
+- fill_square(board, possible_solutions, square, solution, trail):
+  Fills in a square with a solution and updates the possible solutions of its peers.
+
+- undo(board, possible_solutions, trail, mark):
+  Undoes the changes recorded in the trail after the given mark.
+
+- propagate_singles(board, possible_solutions, trail):
+  Fills in every square with only one possible solution, and the squares that are left with one by doing so.
+
+- flatten_possible_solutions(possible_solutions):
+  Lays out the possible solutions as a flat list of 81 masks.
+
+- hidden_singles(possible_solutions):
+  Finds the squares that have a unique possible solution that no other square in their row, column, or box has.
 
 - check_boxes(possible_solutions):
   Checks each box in the Sudoku matrix to find any solutions uniquely determined by a row or a column.
 
-- update_possible_solutions(possible_solutions, row_results, col_results):
+- update_possible_solutions(possible_solutions, row_results, col_results, trail):
   Updates the possible solutions for each square based on the solutions uniquely determined by rows and columns.
 
-- check_paradox(possible_solutions):
-  Checks if there are any squares with no possible solutions.
+- find_min_square(possible_solutions):
+  Finds the square with the minimum number of possible solutions.
+
+- apply_steps(board, possible_solutions, trail):
+  Applies the first three steps of the algorithm until they can't make any more progress.
+
+- check_possible_scenarios(board, possible_solutions):
+  Checks the possible scenarios for filling in the Sudoku matrix until the puzzle is solved.
 
-- check_possible_scenarios(matrix, possible_solutions):
-  Checks the possible scenarios for filling in the Sudoku matrix and recursively solves the puzzle.
+The Sudoku matrix is stored as a bytearray of 81 digits in row-major order, with 0 for the empty squares, and each
+square is referred to by its index row * 9 + column in it.
 
 """
 
-from collections import defaultdict
-from copy import deepcopy
-from typing import List, Tuple, Dict, Union
+from collections import deque
+from typing import List, Tuple, Dict, Iterator, Union
+
+# The rows and the columns of a box
+Box = Tuple[Tuple[int, int, int], Tuple[int, int, int]]
+
+# Bitmask with the bits of all the digits from 1 to 9 set
+ALL_DIGITS = 0x1FF
+
+# The row, column and box index of each square
+ROW_INDEX = [square // 9 for square in range(81)]
+COL_INDEX = [square % 9 for square in range(81)]
+BOX_INDEX = [(i // 3) * 3 + j // 3 for i, j in zip(ROW_INDEX, COL_INDEX)]
+
+# The rows and the columns of each box, and the squares in it, indexed by the box index
+BOXES = [((r, r + 1, r + 2), (c, c + 1, c + 2)) for r in (0, 3, 6) for c in (0, 3, 6)]
+BOX_SQUARES = [[x * 9 + y for x in rows for y in cols] for rows, cols in BOXES]
+
+# The squares of each row and each column
+ROW_SQUARES = [[i * 9 + j for j in range(9)] for i in range(9)]
+COL_SQUARES = [[i * 9 + j for i in range(9)] for j in range(9)]
+
+# All the rows, columns and boxes of the matrix
+ALL_UNITS = ROW_SQUARES + COL_SQUARES + BOX_SQUARES
 
+# The row, the column and the box that contain each square
+UNITS = [[ROW_SQUARES[ROW_INDEX[square]], COL_SQUARES[COL_INDEX[square]], BOX_SQUARES[BOX_INDEX[square]]]
+         for square in range(81)]
 
-def print_matrix(matrix: List[List[str]]) -> None:
+# The 20 squares that share a row, a column or a box with each square
+PEERS = [sorted(set().union(*units) - {square}) for square, units in enumerate(UNITS)]
+
+
+def print_matrix(board: bytearray) -> None:
     """
     Prints the given Sudoku matrix in a human-readable format.
 
     Args:
-        matrix: A 9x9 Sudoku matrix represented as a list of lists of strings.
+        board: The Sudoku matrix represented as a bytearray of 81 digits.
 
     Returns:
         None
     """
 
-    for row in matrix:
-        print(row)
+    for n in range(0, 81, 9):
+        print([str(digit) for digit in board[n:n + 9]])
     print("")
 
 
-def find_box(square: Tuple[int, int]) -> Tuple[Tuple[int, int, int], Tuple[int, int, int]]:
+def mask_to_digit(mask: int) -> int:
+    """
+    Converts a single-bit mask of a solution to the digit it represents.
+
+    Args:
+        mask: A bitmask with only the bit d - 1 set, where d is the digit.
+
+    Returns:
+        The digit.
+    """
+
+    return mask.bit_length()
+
+
+def find_possible_solutions(board: bytearray) -> Dict[int, int]:
     """
-    Finds the box (3x3 subgrid) that contains the given square.
+    Finds the empty squares in the Sudoku matrix and the possible solutions for each one of them.
+
+    The possible solutions of a square are stored as a 9-bit mask, where bit d - 1 is set if and only if the digit d
+    can be placed in the square.
 
     Args:
-        square: A tuple representing the (row, column) indices of a square in the Sudoku matrix.
+        board: The Sudoku matrix represented as a bytearray of 81 digits.
 
     Returns:
-        A tuple containing two tuples. The first tuple represents the rows in the box, and the second tuple
-        represents the columns in the box.
+        A dictionary where the keys are the empty squares and the values are bitmasks of the possible solutions for
+        each square. The keys are the only record of which squares are still empty.
     """
 
-    i, j = square
+    # Masks of the digits already used in each row, column and box
+    row_used = [0] * 9
+    col_used = [0] * 9
+    box_used = [0] * 9
 
-    if 0 <= i <= 2:
-        rows = (0, 1, 2)
-    elif 3 <= i <= 5:
-        rows = (3, 4, 5)
-    else:
-        rows = (6, 7, 8)
+    empty_squares = []
 
-    if 0 <= j <= 2:
-        cols = (0, 1, 2)
-    elif 3 <= j <= 5:
-        cols = (3, 4, 5)
-    else:
-        cols = (6, 7, 8)
+    # A single pass over the matrix collects the used digits and the empty squares
+    for square, digit in enumerate(board):
+        if digit:
+            mask = 1 << (digit - 1)
+            row_used[ROW_INDEX[square]] |= mask
+            col_used[COL_INDEX[square]] |= mask
+            box_used[BOX_INDEX[square]] |= mask
+        else:
+            empty_squares.append(square)
 
-    return rows, cols
+    return {square: ALL_DIGITS & ~(row_used[ROW_INDEX[square]] | col_used[COL_INDEX[square]] |
+                                   box_used[BOX_INDEX[square]])
+            for square in empty_squares}
 
 
-def find_empty_squares(matrix: List[List[str]]) -> List[Tuple[int, int]]:
+def place(possible_solutions: Dict[int, int], square: int, solution: int,
+          trail: Union[List[Tuple[int, int]], None] = None) -> bool:
     """
-    Finds the empty squares in the Sudoku matrix.
+    Removes the solution placed in a square from the possible solutions of the empty squares in the same row, column,
+    and box. This keeps the possible solutions up to date without recomputing them from the whole matrix.
 
     Args:
-        matrix: A 9x9 Sudoku matrix represented as a list of lists of strings.
+        possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
+        square: The index of the square that was filled in.
+        solution: The solution placed in the square as a single-bit mask.
+        trail: If given, every changed square is recorded in it together with its previous possible solutions, so
+            that the change can be undone later.
 
     Returns:
-        A list of tuples representing the (row, column) indices of the empty squares in the Sudoku matrix.
+        True if a peer was left with no possible solutions, False otherwise.
     """
 
-    empty_squares = []
+    paradox = False
+    for peer in PEERS[square]:
+        # Skip the squares that are not empty or that don't have the solution
+        peer_solutions = possible_solutions.get(peer, 0)
+        if peer_solutions & solution:
+            if trail is not None:
+                trail.append((peer, peer_solutions))
+            possible_solutions[peer] = peer_solutions & ~solution
+            if peer_solutions == solution:
+                paradox = True
+
+    return paradox
 
-    for i in range(len(matrix)):
-        for j in range(len(matrix[i])):
-            if not matrix[i][j].isdigit():
-                empty_squares.append((i, j))
 
-    return empty_squares
+def fill_square(board: bytearray, possible_solutions: Dict[int, int], square: int, solution: int,
+                trail: Union[List[Tuple[int, int]], None] = None) -> bool:
+    """
+    Fills in a square of the Sudoku matrix with the given solution and updates the possible solutions of its peers.
 
+    Args:
+        board: The Sudoku matrix represented as a bytearray of 81 digits.
+        possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
+        square: The index of the square to fill in.
+        solution: The solution to place in the square as a single-bit mask.
+        trail: If given, every change is recorded in it so that it can be undone later with undo().
 
-def find_possible_solutions(matrix: List[List[str]],
-                            empty_squares: List[Tuple[int, int]]) -> Dict[Tuple[int, int], List[str]]:
+    Returns:
+        True if a square was left with no possible solutions, False otherwise.
     """
-    Finds the possible solutions for each empty square in the Sudoku matrix.
+
+    if trail is not None:
+        trail.append((square, possible_solutions[square]))
+    board[square] = mask_to_digit(solution)
+    del possible_solutions[square]
+    return place(possible_solutions, square, solution, trail)
+
+
+def undo(board: bytearray, possible_solutions: Dict[int, int], trail: List[Tuple[int, int]], mark: int) -> None:
+    """
+    Undoes the changes recorded in the trail after the given mark, restoring the matrix and the possible solutions to
+    the state they had when the trail had that length.
 
     Args:
-        matrix: A 9x9 Sudoku matrix represented as a list of lists of strings.
-        empty_squares: A list of tuples representing the (row, column) indices of the empty squares.
+        board: The Sudoku matrix represented as a bytearray of 81 digits.
+        possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
+        trail: The list of (square, previous possible solutions) changes.
+        mark: The length of the trail to go back to.
 
     Returns:
-        A dictionary where the keys are the empty squares and the values are lists of possible solutions for each
-        square.
+        None
     """
 
-    possible_solutions = {}
-    for empty_square in empty_squares:
-        possible_solutions[empty_square] = [str(x) for x in range(1, 10)]
+    while len(trail) > mark:
+        square, solutions = trail.pop()
+        # A square that is no longer in the possible solutions was filled in, so empty it again
+        if square not in possible_solutions:
+            board[square] = 0
+        possible_solutions[square] = solutions
+
 
-    for empty_square in empty_squares:
-        i, j = empty_square
+def propagate_singles(board: bytearray, possible_solutions: Dict[int, int],
+                      trail: Union[List[Tuple[int, int]], None] = None) -> bool:
+    """
+    Fills in every square with only one possible solution. The peers of each filled square that are left with only one
+    possible solution are queued and filled in as well, until no such square is left.
+
+    Args:
+        board: The Sudoku matrix represented as a bytearray of 81 digits.
+        possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
+        trail: If given, every change is recorded in it so that it can be undone later with undo().
+
+    Returns:
+        True if a square was left with no possible solutions, False otherwise.
+    """
 
-        for element in matrix[i]:
-            if element in possible_solutions[empty_square]:
-                possible_solutions[empty_square].remove(element)
+    singles = deque(square for square, solutions in possible_solutions.items() if solutions.bit_count() <= 1)
 
-        for row in matrix:
-            if row[j] in possible_solutions[empty_square]:
-                possible_solutions[empty_square].remove(row[j])
+    while singles:
+        square = singles.popleft()
+        # Skip the squares that were queued more than once and are already filled in
+        if square not in possible_solutions:
+            continue
 
-        rows, cols = find_box(empty_square)
+        solutions = possible_solutions[square]
+        if solutions == 0 or fill_square(board, possible_solutions, square, solutions, trail):
+            return True
 
-        for x in rows:
-            for y in cols:
-                if matrix[x][y] in possible_solutions[empty_square]:
-                    possible_solutions[empty_square].remove(matrix[x][y])
+        for peer in PEERS[square]:
+            if possible_solutions.get(peer, 0).bit_count() == 1:
+                singles.append(peer)
 
-    return possible_solutions
+    return False
 
 
-def compare_solutions(possible_solutions: Dict[Tuple[int, int], List[str]],
-                      square: Tuple[int, int]) -> Union[str, None]:
+def flatten_possible_solutions(possible_solutions: Dict[int, int]) -> List[int]:
     """
-    Compares the possible solutions for a given square with the solutions of other squares in the same row, column,
-    and box, and returns a unique solution if one exists.
+    Lays out the possible solutions as a flat list of 81 masks, so that the sweeps over the rows, columns and boxes can
+    index a list instead of looking each square up in the dictionary.
 
     Args:
         possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
-        square: A tuple representing the (row, column) indices of a square in the Sudoku matrix.
 
     Returns:
-        If a unique solution exists for the given square, it returns the solution as a string. Otherwise, it returns
-        None.
+        A list with the possible solutions of each square, with 0 for the squares that are not empty.
     """
 
-    i, j = square
+    masks = [0] * 81
+    for square, solutions in possible_solutions.items():
+        masks[square] = solutions
 
-    solutions = possible_solutions[square]
+    return masks
 
-    # Check solutions in the same row
-    for solution in solutions:
-        for other_square, other_solutions in possible_solutions.items():
-            # Skip the current square and squares that are in different rows
-            if other_square != square and other_square[0] == i:
-                if solution in other_solutions:
-                    break
-        else:
-            return solution
-
-    # Check solutions in the same column
-    for solution in solutions:
-        for other_square, other_solutions in possible_solutions.items():
-            # Skip the current square and squares that are in different columns
-            if other_square != square and other_square[1] == j:
-                if solution in other_solutions:
-                    break
-        else:
-            return solution
 
-    # Check solutions in the same box
-    rows, cols = find_box(square)
+def hidden_singles(possible_solutions: Dict[int, int]) -> Iterator[Tuple[int, int]]:
+    """
+    Finds the squares that have a unique possible solution that no other square in their row, column, or box has.
+
+    Each row, column and box is swept once. The solutions that appear at least once and at least twice in the unit
+    are collected, and those that appear exactly once are unique to the square that has them.
 
-    for solution in solutions:
-        solution_exists = True
-        for x in rows:
-            for y in cols:
-                # Skip the current square and squares that are not empty
-                if (x, y) != square and (x, y) in possible_solutions:
-                    if solution in possible_solutions[(x, y)]:
-                        solution_exists = False
+    Args:
+        possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
 
-        if solution_exists:
-            return solution
+    Yields:
+        Tuples containing a square and its unique solutions as a bitmask. The rows are checked first, then the
+        columns and then the boxes. The possible solutions are read once, when the sweep starts.
+    """
 
+    masks = flatten_possible_solutions(possible_solutions)
 
-def check_boxes(possible_solutions: Dict[Tuple[int, int], List[str]]) \
-        -> Tuple[List[Tuple[str, int, List[Tuple[int, int, int]]]], List[Tuple[str, int, List[Tuple[int, int, int]]]]]:
+    for unit in ALL_UNITS:
+        once = 0  # Solutions that appear at least once in the unit
+        twice = 0  # Solutions that appear at least twice in the unit
+        for square in unit:
+            solutions = masks[square]
+            twice |= once & solutions
+            once |= solutions
+
+        unique_solutions = once & ~twice
+        if unique_solutions:
+            for square in unit:
+                solutions = masks[square] & unique_solutions
+                if solutions:
+                    yield square, solutions
+
+
+def check_boxes(possible_solutions: Dict[int, int]) \
+        -> Tuple[List[Tuple[int, int, Box]], List[Tuple[int, int, Box]]]:
     """
     Checks each box in the Sudoku matrix to find any solutions that are uniquely determined by a row or a column.
 
@@ -211,45 +324,44 @@ def check_boxes(possible_solutions: Dict[Tuple[int, int], List[str]]) \
     Returns:
         A tuple of two lists. The first list contains tuples representing the solutions uniquely determined by a row,
         and the second list contains tuples representing the solutions uniquely determined by a column. Each tuple
-        contains the solution as a string, the row or column index, and the indices of the squares in the box.
+        contains the solution as a single-bit mask, the row or column index, and the indices of the squares in the box.
     """
 
-    boxes = [[(0, 1, 2), (0, 1, 2)], [(0, 1, 2), (3, 4, 5)], [(0, 1, 2), (6, 7, 8)], [(3, 4, 5), (0, 1, 2)],
-             [(3, 4, 5), (3, 4, 5)], [(3, 4, 5), (6, 7, 8)], [(6, 7, 8), (0, 1, 2)], [(6, 7, 8), (3, 4, 5)],
-             [(6, 7, 8), (6, 7, 8)]]
+    masks = flatten_possible_solutions(possible_solutions)
 
     row_results = []  # Stores solutions uniquely determined by a row
     col_results = []  # Stores solutions uniquely determined by a column
 
-    for box in boxes:
-        rows_dict = defaultdict(list)  # Stores the row indices for each solution
-        cols_dict = defaultdict(list)  # Stores the column indices for each solution
-
-        # Iterate through each square in the current box
-        for x in box[0]:
-            for y in box[1]:
-                if (x, y) in possible_solutions:
-                    for solution in possible_solutions[(x, y)]:
-                        rows_dict[solution].append(x)  # Add row index for the solution in the row_dict
-                        cols_dict[solution].append(y)  # Add column index for the solution in the cols_dict
-
-        # Check for solutions uniquely determined by a row
-        for solution, rows in rows_dict.items():
-            if all((z == rows[0] for z in rows[1:])):
-                row_results.append((solution, rows[0], box))
+    for box, box_squares in zip(BOXES, BOX_SQUARES):
+        # The squares of the box are in row-major order, so each row of the box is a run of three squares and each
+        # column of the box takes every third square
+        a, b, c, d, e, f, g, h, k = [masks[square] for square in box_squares]
+        rows_masks = (a | b | c, d | e | f, g | h | k)  # Stores the solutions of each row of the box
+        cols_masks = (a | d | g, b | e | h, c | f | k)  # Stores the solutions of each column of the box
+
+        # Check for solutions uniquely determined by a row, i.e. solutions that don't appear in the other two rows
+        for n in range(3):
+            solutions = rows_masks[n] & ~(rows_masks[(n + 1) % 3] | rows_masks[(n + 2) % 3])
+            while solutions:
+                solution = solutions & -solutions
+                solutions ^= solution
+                row_results.append((solution, box[0][n], box))
 
         # Check for solutions uniquely determined by a column
-        for solution, cols in cols_dict.items():
-            if all((z == cols[0] for z in cols[1:])):
-                col_results.append((solution, cols[0], box))
+        for n in range(3):
+            solutions = cols_masks[n] & ~(cols_masks[(n + 1) % 3] | cols_masks[(n + 2) % 3])
+            while solutions:
+                solution = solutions & -solutions
+                solutions ^= solution
+                col_results.append((solution, box[1][n], box))
 
     return row_results, col_results
 
 
-def update_possible_solutions(possible_solutions: Dict[Tuple[int, int], List[str]],
-                              row_results: List[Tuple[str, int, List[Tuple[int, int, int]]]],
-                              col_results: List[Tuple[str, int, List[Tuple[int, int, int]]]]) \
-        -> Dict[Tuple[int, int], List[str]]:
+def update_possible_solutions(possible_solutions: Dict[int, int],
+                              row_results: List[Tuple[int, int, Box]],
+                              col_results: List[Tuple[int, int, Box]],
+                              trail: Union[List[Tuple[int, int]], None] = None) -> Tuple[Dict[int, int], bool]:
     """
     Updates the possible solutions for each square in the Sudoku matrix based on the solutions uniquely determined
     by rows and columns.
@@ -257,147 +369,170 @@ def update_possible_solutions(possible_solutions: Dict[Tuple[int, int], List[str
     Args:
         possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
         row_results: A list of tuples representing the solutions uniquely determined by a row. Each tuple contains
-            the solution as a string, the row index, and the indices of the squares in the box.
+            the solution as a single-bit mask, the row index, and the indices of the squares in the box.
         col_results: A list of tuples representing the solutions uniquely determined by a column. Each tuple contains
-            the solution as a string, the column index, and the indices of the squares in the box.
+            the solution as a single-bit mask, the column index, and the indices of the squares in the box.
+        trail: If given, every changed square is recorded in it together with its previous possible solutions, so
+            that the change can be undone later.
 
     Returns:
-        The updated dictionary of possible solutions.
+        A tuple containing the updated dictionary of possible solutions, which is updated in place, and a boolean that
+        is True if any possible solution was removed.
     """
 
-    possible_solutions = deepcopy(possible_solutions)
+    changed = False
 
     # Update possible solutions based on row results
     for result in row_results:
         solution, row, box = result
         for j in range(9):
-            # Skip if (row, j) is in the box of the row results or if it is not empty
-            if j in box[1] or (row, j) not in possible_solutions:
+            # Skip if (row, j) is in the box of the row results, if it is not empty or if it doesn't have the solution
+            solutions = possible_solutions.get(row * 9 + j, 0)
+            if j in box[1] or not solutions & solution:
                 continue
-            elif solution in possible_solutions[(row, j)]:
-                possible_solutions[(row, j)].remove(solution)
+            if trail is not None:
+                trail.append((row * 9 + j, solutions))
+            possible_solutions[row * 9 + j] = solutions & ~solution
+            changed = True
 
     # Update possible solutions based on column results
     for result in col_results:
         solution, col, box = result
         for i in range(9):
-            # Skip if (row, j) is in the box of the column results or if it is not empty
-            if i in box[0] or (i, col) not in possible_solutions:
+            # Skip if (i, col) is in the box of the column results, if it is not empty or if it doesn't have the
+            # solution
+            solutions = possible_solutions.get(i * 9 + col, 0)
+            if i in box[0] or not solutions & solution:
                 continue
-            elif solution in possible_solutions[(i, col)]:
-                possible_solutions[(i, col)].remove(solution)
+            if trail is not None:
+                trail.append((i * 9 + col, solutions))
+            possible_solutions[i * 9 + col] = solutions & ~solution
+            changed = True
 
-    return possible_solutions
+    return possible_solutions, changed
 
 
-def check_paradox(possible_solutions: Dict[Tuple[int, int], List[str]]) -> bool:
+def find_min_square(possible_solutions: Dict[int, int]) -> int:
     """
-    Checks if there are any squares in the Sudoku matrix with no possible solutions.
+    Finds the square with the minimum number of possible solutions.
+
+    It is only called once the first three steps of the algorithm can't make any more progress, so no square has fewer
+    than two possible solutions and the search stops at the first square with two.
 
     Args:
-        possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
+        possible_solutions: A non-empty dictionary containing the possible solutions for each square in the matrix.
 
     Returns:
-        True if there is at least one square with no possible solutions, False otherwise.
+        The index of the square with the minimum number of possible solutions.
     """
 
+    min_square = -1
+    min_solutions = 10
     for square, solutions in possible_solutions.items():
-        if not solutions:
+        count = solutions.bit_count()
+        if count < min_solutions:
+            min_square = square
+            min_solutions = count
+            if min_solutions <= 2:
+                break
+
+    return min_square
+
+
+def apply_steps(board: bytearray, possible_solutions: Dict[int, int],
+                trail: Union[List[Tuple[int, int]], None] = None) -> bool:
+    """
+    Applies the first three steps of the algorithm until the Sudoku matrix is complete or none of them can fill in a
+    square or remove a possible solution any more.
+
+    Args:
+        board: The Sudoku matrix represented as a bytearray of 81 digits.
+        possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
+        trail: If given, every change is recorded in it so that it can be undone later with undo().
+
+    Returns:
+        True if a square was left with no possible solutions, which means that the matrix has no solution, False
+        otherwise.
+    """
+
+    while possible_solutions:
+        # 1. Fill in every square with only one possible solution, along with the squares that are left with only one
+        # possible solution by doing so.
+        if propagate_singles(board, possible_solutions, trail):
             return True
+        if not possible_solutions:
+            break
+
+        # 2. Then check if any square has a unique possible solution that no other square in its row, column, or box
+        # has, and if so, fill it in.
+        for square, solutions in hidden_singles(possible_solutions):
+            fill_square(board, possible_solutions, square, solutions & -solutions, trail)
+            break
+        # 3. If the above steps don't yield a solution, check if any box has a solution that can only fit in a single
+        # row or column. Remove this solution from the possible solutions of other squares in the same row or column
+        # outside of that box. If there is no such solution either, the steps can't make any more progress.
+        else:
+            row_results, col_results = check_boxes(possible_solutions)
+            possible_solutions, changed = update_possible_solutions(possible_solutions, row_results,
+                                                                    col_results, trail)
+            if not changed:
+                break
+
     return False
 
 
-def check_possible_scenarios(matrix: List[List[str]],
-                             possible_solutions: Dict[Tuple[int, int], List[str]]) -> Union[List[List[str]], None]:
+def check_possible_scenarios(board: bytearray, possible_solutions: Dict[int, int]) -> Union[bytearray, None]:
     """
-    Creates copies of the matrix with only one square updated. It makes one copy for each possible solution of the
-    updated square. Then it restarts the main algorithm for each copy until the correct solution is found.
+    Tries each possible solution of the square with the minimum number of possible solutions, one at a time, and
+    applies the first three steps of the algorithm for each of them. If a scenario still needs a guess, its own
+    scenarios are tried in the same way, until the correct solution is found.
+
+    Instead of copying the matrix for each scenario, every change is recorded in a trail and undone when the scenario
+    leads to a paradox. The scenarios that are still to be tried are kept in an explicit stack instead of recursive
+    calls, so that hard puzzles can't reach the recursion limit.
 
     Args:
-        matrix: The Sudoku matrix represented as a 9x9 list of strings.
+        board: The Sudoku matrix represented as a bytearray of 81 digits.
         possible_solutions: A dictionary containing the possible solutions for each square in the Sudoku matrix.
 
     Returns:
-        If a solution is found, it returns the completed Sudoku matrix as a list of lists. If no solution is found,
-        it returns None.
+        If a solution is found, it returns the completed Sudoku matrix. If no solution is found, it returns None and
+        the matrix and the possible solutions are left as they were.
     """
 
-    # Determine what is the minimum number of possible solutions for a square in the sudoku matrix
-    min_solutions = len(min(possible_solutions.values(), key=len))
-    # Create a list with as many matrix copies as the minimum solutions
-    matrix_copies = [deepcopy(matrix) for _ in range(min_solutions)]
+    trail = []
 
-    # Create all the possible versions of the matrix by setting the value of a square, with the minimum number of
-    # possible values, to all the possible values, one for each copy. So for sure one of these copies will be the right
-    # one
-    for square, solutions in possible_solutions.items():
-        if len(solutions) == min_solutions:
-            i, j = square
-            for n in range(min_solutions):
-                matrix_copies[n][i][j] = solutions[n]
-            break
+    # Each entry of the stack holds the length of the trail before the scenarios of a square were tried, the square
+    # and its possible solutions that haven't been tried yet. Start with the square with the minimum number of possible
+    # solutions, so for sure one of its possible solutions will be the right one.
+    square = find_min_square(possible_solutions)
+    stack = [(0, square, possible_solutions[square])]
 
-    # Iterate through each matrix copy
-    for matrix_copy in matrix_copies:
-        empty_squares_copy = find_empty_squares(matrix_copy)
-        possible_solutions_copy = find_possible_solutions(matrix_copy, empty_squares_copy)
-        finished = True  # If finished is True after the "while" loop beneath is complete, that means that the
-        # check_possible_scenarios function has solved the Sudoku matrix, and it can return it
-        if check_paradox(possible_solutions_copy):
+    while stack:
+        mark, square, solutions = stack.pop()
+        # If all the possible solutions of the square led to a paradox, go back to the previous square
+        if not solutions:
             continue
 
-        while empty_squares_copy:
-            min_solutions = len(min(possible_solutions_copy.values(), key=len))
-
-            # 1. If there is a square with only one possible solution, fill it in.
-            if min_solutions == 1:
-                for square, solutions in possible_solutions_copy.items():
-                    if len(solutions) == 1:
-                        i, j = square
-                        matrix_copy[i][j] = solutions[0]
-                        empty_squares_copy.remove(square)
-                        possible_solutions_copy = find_possible_solutions(matrix_copy, empty_squares_copy)
-                        break
-            # 2. If not, check if any square has a unique possible solution that no other square in its row, column, or
-            # box has, and if so, fill it in.
-            else:
-                for length in range(2, 10):
-                    break_both = False
-                    for square, solutions in possible_solutions_copy.items():
-                        if len(solutions) == length:
-                            i, j = square
-                            solution = compare_solutions(possible_solutions_copy, square)
-                            if solution is not None:
-                                matrix_copy[i][j] = solution
-                                empty_squares_copy.remove(square)
-                                possible_solutions_copy = find_possible_solutions(matrix_copy, empty_squares_copy)
-                                break_both = True
-                                break
-                    if break_both:
-                        break
-                # 3. If the above steps don't yield a solution, check if any box has a solution that can only fit in a
-                # single row or column. Remove this solution from the possible solutions of other squares in the same
-                # row or column outside of that box.
-                else:
-                    row_results, col_results = check_boxes(possible_solutions_copy)
-
-                    old_possible_solutions = deepcopy(possible_solutions_copy)
-                    possible_solutions_copy = update_possible_solutions(possible_solutions_copy, row_results,
-                                                                        col_results)
-                    # 4. If none of the previous steps provide a solution, create copies of the current matrix with only
-                    # one square updated. Make one copy for each possible solution of the updated square. Then restart
-                    # the algorithm for each copy until the correct solution is found.
-                    if old_possible_solutions == possible_solutions_copy:
-                        matrix_copy = check_possible_scenarios(matrix_copy, possible_solutions_copy)
-                        # If the recursive call of the function didn't succeed, that means that all the possible
-                        # scenarios of the current matrix copy led to a paradox which means that this copy isn't the
-                        # right one and the function shouldn't return it and instead move to the next matrix copy. So
-                        # set finished = False
-                        if matrix_copy is None:
-                            finished = False
-                            break
-                        else:
-                            return matrix_copy
-
-        if finished:
-            return matrix_copy
+        # Undo the previous scenario of the square and try the next one
+        undo(board, possible_solutions, trail, mark)
+        solution = solutions & -solutions
+        stack.append((mark, square, solutions ^ solution))
+
+        # If filling in the square or applying the steps leaves a square with no possible solutions, this scenario led
+        # to a paradox
+        if fill_square(board, possible_solutions, square, solution, trail) or \
+                apply_steps(board, possible_solutions, trail):
+            continue
+
+        if not possible_solutions:
+            return board
+
+        # 4. The steps couldn't complete the matrix, so try the scenarios of the square with the minimum number of
+        # possible solutions
+        square = find_min_square(possible_solutions)
+        stack.append((len(trail), square, possible_solutions[square]))
+
+    undo(board, possible_solutions, trail, 0)
+
+    return None
@@ -5,15 +5,16 @@ squares, and determines the possible solutions for each empty square. It then ap
 squares until the entire Sudoku matrix is solved.
 
 The main steps of the algorithm are as follows:
-1. If there is a square with only one possible solution, fill it in.
-2. If not, check if any square has a unique possible solution that no other square in its row, column, or box has,
+1. Fill in every square with only one possible solution, along with the squares that are left with only one possible
+   solution by doing so.
+2. Then check if any square has a unique possible solution that no other square in its row, column, or box has,
    and if so, fill it in.
 3. If the above steps don't yield a solution, check if any box has a solution that can only fit in a single row or
    column. Remove this solution from the possible solutions of other squares in the same row or column outside of
    that box.
-4. If none of the previous steps provide a solution, create copies of the current matrix with only one square
-   updated. Make one copy for each possible solution of the updated square. Then restart the algorithm for each copy
-   until the correct solution is found.
+4. If none of the previous steps provide a solution, pick the square with the minimum number of possible solutions
+   and try each of its possible solutions, one at a time. Apply the steps again for each of them and undo its changes
+   if it leads to a paradox, until the correct solution is found.
 
 The solved Sudoku matrix is printed to the console.
 
@@ -25,9 +26,7 @@ the classical 9x9 sudoku matrices and not other variations.
 
 """
 
-from sudoku_functions import print_matrix, find_empty_squares, find_possible_solutions, compare_solutions, check_boxes,\
-    update_possible_solutions, check_possible_scenarios
-from copy import deepcopy
+from sudoku_functions import print_matrix, find_possible_solutions, apply_steps, check_possible_scenarios
 
 
 def main():
@@ -46,62 +45,27 @@ def main():
 
     """
 
-    # Get the Sudoku matrix and transfer it into a 2D list
+    # Get the Sudoku matrix and transfer it into a bytearray of 81 digits, with 0 for the empty squares
     users_input = input("Enter the matrix: ").strip()
-    raw_matrix = users_input.split(",")
-    matrix = [[raw_matrix[i] for i in range(n, n + 9)] for n in range(0, 81, 9)]
+    values = users_input.split(",")
+    if len(values) < 81:
+        print("The Sudoku matrix must have 81 values")
+        return
+    board = bytearray(int(value) if value.isdigit() else 0 for value in values[:81])
 
     # Find the empty squares of the matrix and all the possible solutions for each one of them
-    empty_squares = find_empty_squares(matrix)
-    possible_solutions = find_possible_solutions(matrix, empty_squares)
-
-    # Loop through the 4 main steps of the algorithm until you get the solved Sudoku matrix
-    while empty_squares:
-        min_solutions = len(min(possible_solutions.values(), key=len))
-
-        # 1. If there is a square with only one possible solution, fill it in.
-        if min_solutions == 1:
-            for square, solutions in possible_solutions.items():
-                if len(solutions) == 1:
-                    i, j = square
-                    matrix[i][j] = solutions[0]
-                    empty_squares.remove(square)
-                    possible_solutions = find_possible_solutions(matrix, empty_squares)
-                    break
-        # 2. If not, check if any square has a unique possible solution that no other square in its row, column, or box
-        # has, and if so, fill it in.
-        else:
-            for length in range(2, 10):
-                break_both = False
-                for square, solutions in possible_solutions.items():
-                    if len(solutions) == length:
-                        i, j = square
-                        solution = compare_solutions(possible_solutions, square)
-                        if solution is not None:
-                            matrix[i][j] = solution
-                            empty_squares.remove(square)
-                            possible_solutions = find_possible_solutions(matrix, empty_squares)
-                            break_both = True
-                            break
-                if break_both:
-                    break
-            # 3. If the above steps don't yield a solution, check if any box has a solution that can only fit in a
-            # single row or column. Remove this solution from the possible solutions of other squares in the same row
-            # or column outside of that box.
-            else:
-                row_results, col_results = check_boxes(possible_solutions)
-                old_possible_solutions = deepcopy(possible_solutions)
-                possible_solutions = update_possible_solutions(possible_solutions, row_results, col_results)
-
-                # 4. If none of the previous steps provide a solution, create copies of the current matrix with only
-                # one square updated. Make one copy for each possible solution of the updated square. Then restart the
-                # algorithm for each copy until the correct solution is found.
-                if old_possible_solutions == possible_solutions:
-                    matrix = check_possible_scenarios(matrix, possible_solutions)
-                    break
-
-    if matrix is not None:
-        print_matrix(matrix)
+    possible_solutions = find_possible_solutions(board)
+
+    # Apply the first 3 steps of the algorithm until they can't fill in any more squares
+    if apply_steps(board, possible_solutions):
+        board = None
+    # 4. If the first 3 steps don't complete the matrix, try each possible solution of the square with the minimum
+    # number of possible solutions. Then apply the steps again for each of them until the correct solution is found.
+    elif possible_solutions:
+        board = check_possible_scenarios(board, possible_solutions)
+
+    if board is not None:
+        print_matrix(board)
     else:
         print("There is not a valid solution for this Sudoku matrix")
 